@@ -10,14 +10,14 @@ from streamlit_folium import st_folium
 from src.data_loader import get_data
 from src.predictor import predict_from_raw_restaurant
 from src.utils import (
+    dist2,
     get_grade_color,
-    restaurant_popup_html,
-    VIOLATION_SHORT,
-    UNKNOWN_VIOLATION_LABEL,
+    restaurant_popups_html,
+    label_violations,
 )
 from src.places import (
-    google_place_details,
-    reverse_geocode,
+    cached_place_details,
+    cached_reverse_geocode,
     normalize_place_to_restaurant,
     google_nearby_restaurants,
 )
@@ -86,18 +86,10 @@ st.markdown(
 # 📥 Load & prepare data
 # -------------------------------------------------
 def load_app_data():
+    # Rows without coordinates are already dropped by the loader, and
+    # borough / cuisine text is already normalized there
     df = get_data()
 
-    # Drop rows without coordinates (for the map)
-    if "latitude" in df.columns and "longitude" in df.columns:
-        df = df.dropna(subset=["latitude", "longitude"])
-
-    # Normalize text fields
-    df["borough"] = df["borough"].astype(str).str.strip().str.title()
-    df["cuisine_description"] = (
-        df["cuisine_description"].astype(str).str.strip().str.title()
-    )
-
     return df
 
 
@@ -164,12 +156,18 @@ def build_map(center, zoom, df_for_map, google_nearby_data, google_mode: bool):
 
     # Dataset markers (only if NOT in google mode)
     if not google_mode:
-        for _, row in df_for_map.iterrows():
-            lat = row["latitude"]
-            lon = row["longitude"]
-            grade = row.get("grade", "N/A")
+        grades = (
+            df_for_map["grade"].tolist()
+            if "grade" in df_for_map.columns
+            else ["N/A"] * len(df_for_map)
+        )
+        for lat, lon, grade, popup_html in zip(
+            df_for_map["latitude"].tolist(),
+            df_for_map["longitude"].tolist(),
+            grades,
+            restaurant_popups_html(df_for_map),
+        ):
             color = get_grade_color(grade)
-            popup_html = restaurant_popup_html(row)
 
             folium.CircleMarker(
                 location=[lat, lon],
@@ -203,13 +201,6 @@ def build_map(center, zoom, df_for_map, google_nearby_data, google_mode: bool):
     return m
 
 
-# -------------------------------------------------
-# 📐 Distance helper
-# -------------------------------------------------
-def _dist2(lat1, lon1, lat2, lon2):
-    return (lat1 - lat2) ** 2 + (lon1 - lon2) ** 2
-
-
 # -------------------------------------------------
 # MAIN LAYOUT: Map (left) + Inspect/Prediction (right)
 # -------------------------------------------------
@@ -351,12 +342,7 @@ with right_col:
             min_ds_dist = float("inf")
 
             for _, row in df_filtered.iterrows():
-                lat = row.get("latitude")
-                lon = row.get("longitude")
-                if pd.isna(lat) or pd.isna(lon):
-                    continue
-
-                d2 = _dist2(clat, clon, lat, lon)
+                d2 = dist2(clat, clon, row["latitude"], row["longitude"])
                 if d2 < min_ds_dist:
                     min_ds_dist = d2
                     closest_row = row
@@ -420,7 +406,7 @@ with right_col:
             for place in st.session_state["google_nearby"]:
                 plat = place["geometry"]["location"]["lat"]
                 plon = place["geometry"]["location"]["lng"]
-                d2 = _dist2(clat, clon, plat, plon)
+                d2 = dist2(clat, clon, plat, plon)
                 if d2 < min_nb_dist:
                     min_nb_dist = d2
                     closest_place = place
@@ -431,7 +417,7 @@ with right_col:
 
                 st.markdown("## 🍽️ Google Nearby Restaurant Selected")
 
-                details = google_place_details(closest_place["place_id"])
+                details = cached_place_details(closest_place["place_id"])
                 norm = normalize_place_to_restaurant(details)
 
                 st.session_state["google_restaurant_nearby"] = norm
@@ -465,7 +451,7 @@ with right_col:
         # PRIORITY 3 — Plain map click
         # ----------------------------------------------
         else:
-            zipcode, borough, address = reverse_geocode(clat, clon)
+            zipcode, borough, address = cached_reverse_geocode(clat, clon)
 
             st.markdown("## 📍 Map Click Detected")
             st.write(f"**Address:** {address or 'Unknown'}")
@@ -521,8 +507,8 @@ with col2:
         )
         violation_counts.columns = ["violation_code", "count"]
 
-        violation_counts["description"] = violation_counts["violation_code"].apply(
-            lambda code: VIOLATION_SHORT.get(code, UNKNOWN_VIOLATION_LABEL)
+        violation_counts["description"] = label_violations(
+            violation_counts["violation_code"]
         )
 
         violation_counts = violation_counts.head(10)
@@ -559,7 +545,7 @@ worst_cuisines = None
 
 if "cuisine_description" in df_filtered.columns and len(df_filtered) > 0:
     cuisine_scores = (
-        df_filtered.groupby("cuisine_description")["score"]
+        df_filtered.groupby("cuisine_description", observed=True)["score"]
         .mean()
         .sort_values()
     )
@@ -5,7 +5,7 @@ import altair as alt
 import pandas as pd
 
 from src.data_loader import get_data
-from src.utils import VIOLATION_SHORT, UNKNOWN_VIOLATION_LABEL, get_grade_color
+from src.utils import get_grade_color, label_violations
 
 # -------------------------------------------------
 # Load data
@@ -264,8 +264,8 @@ if "violation_code" in df_filtered.columns:
     )
     violation_counts.columns = ["violation_code", "count"]
 
-    violation_counts["description"] = violation_counts["violation_code"].apply(
-        lambda code: VIOLATION_SHORT.get(code, UNKNOWN_VIOLATION_LABEL)
+    violation_counts["description"] = label_violations(
+        violation_counts["violation_code"]
     )
 
     violation_counts = violation_counts.head(10)
@@ -296,7 +296,7 @@ st.markdown("---")
 
 if "cuisine_description" in df_filtered.columns and "score" in df_filtered.columns:
     cuisine_scores = (
-        df_filtered.groupby("cuisine_description")["score"]
+        df_filtered.groupby("cuisine_description", observed=True)["score"]
         .mean()
         .sort_values()
     )
@@ -4,7 +4,7 @@ import pandas as pd
 import altair as alt
 
 from src.data_loader import get_data
-from src.utils import VIOLATION_SHORT, UNKNOWN_VIOLATION_LABEL
+from src.utils import VIOLATION_SHORT, UNKNOWN_VIOLATION_LABEL, label_violations
 
 df = get_data()
 
@@ -444,7 +444,7 @@ with col4:
 
     if "cuisine_description" in df.columns and "score" in df.columns:
         cuisine_stats = (
-            df.groupby("cuisine_description")["score"]
+            df.groupby("cuisine_description", observed=True)["score"]
             .agg(["mean", "count"])
         )
 
@@ -589,9 +589,7 @@ with st.expander("🏙️ Pick a borough → see top 5 violations"):
                 .head(5)
             )
             vio_counts.columns = ["violation_code", "count"]
-            vio_counts["description"] = vio_counts["violation_code"].apply(
-                lambda c: VIOLATION_SHORT.get(c, UNKNOWN_VIOLATION_LABEL)
-            )
+            vio_counts["description"] = label_violations(vio_counts["violation_code"])
 
             chart_vio = (
                 alt.Chart(vio_counts)
@@ -1,16 +1,15 @@
 import streamlit as st
 from streamlit_folium import st_folium
 import folium
-import pandas as pd
 
 # ==== IMPORT YOUR INTERNAL FUNCTIONS/MODELS ====
 from src.predictor import predict_from_raw_restaurant
-from src.utils import get_grade_color, _dist2
-from src.data_loader import load_model_data
-from src.google import google_place_details, normalize_place_to_restaurant, reverse_geocode
+from src.utils import get_grade_color, dist2
+from src.data_loader import get_shared_df
+from src.places import cached_reverse_geocode
 
-# Load your main dataset
-df_all = load_model_data()
+# Load your main dataset (shared, read-only — do not mutate)
+df_all = get_shared_df()
 
 # -------------------------
 # PAGE CONFIG
@@ -51,8 +50,8 @@ if st.sidebar.button("Reset Filters"):
     st.session_state["filters_reset"] = True
     st.rerun()
 
-# Filter dataset
-df_filtered = df_all.copy()
+# Filter dataset (boolean masks below return new frames; no copy needed)
+df_filtered = df_all
 
 if borough_choice:
     df_filtered = df_filtered[df_filtered["borough"].isin(borough_choice)]
@@ -86,9 +85,6 @@ with left_col:
     # Add dataset markers (optional depending on Google mode)
     if not google_mode:
         for _, row in df_filtered.iterrows():
-            if pd.isna(row["latitude"]) or pd.isna(row["longitude"]):
-                continue
-
             folium.CircleMarker(
                 location=[row["latitude"], row["longitude"]],
                 radius=3,
@@ -98,16 +94,20 @@ with left_col:
                 popup=row.get("DBA", "Restaurant"),
             ).add_to(m)
 
-    # Show map & capture click
-    map_output = st_folium(m, height=550, width="100%", returned_objects=["last_clicked"])
+    # Show map & capture click.
+    # A stable key keeps the component mounted across reruns, and only
+    # clicks are sent back (pan/zoom don't trigger a rerun).
+    map_output = st_folium(
+        m,
+        height=550,
+        width="100%",
+        key="predmap",
+        returned_objects=["last_clicked"],
+    )
 
-    click = None
-    if map_output and map_output.get("last_clicked"):
-        click = (
-            map_output["last_clicked"]["lat"],
-            map_output["last_clicked"]["lng"]
-        )
-        st.session_state["map_click"] = click
+    new_click = map_output.get("last_clicked") if map_output else None
+    if new_click:
+        st.session_state["map_click"] = (new_click["lat"], new_click["lng"])
 
 # -------------------------
 # RIGHT COLUMN — Prediction Panel
@@ -130,10 +130,7 @@ with right_col:
         min_dist = float("inf")
 
         for _, row in df_filtered.iterrows():
-            if pd.isna(row["latitude"]) or pd.isna(row["longitude"]):
-                continue
-
-            d2 = _dist2(clat, clon, row["latitude"], row["longitude"])
+            d2 = dist2(clat, clon, row["latitude"], row["longitude"])
             if d2 < min_dist:
                 min_dist = d2
                 closest_row = row
@@ -189,7 +186,7 @@ with right_col:
     # =================================
     # PRIORITY 3 — Blank click
     # =================================
-    zipcode, borough, address = reverse_geocode(clat, clon)
+    zipcode, borough, address = cached_reverse_geocode(clat, clon)
 
     st.markdown("## 📍 Location Clicked")
     st.write(f"**Address:** {address or 'Unknown'}")
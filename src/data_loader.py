@@ -1,5 +1,10 @@
+import glob
+import hashlib
 import pandas as pd
 import os
+import re
+import tempfile
+from types import MappingProxyType
 import streamlit as st
 
 # -------------------------------------------------
@@ -13,11 +18,235 @@ DATA_DIR = os.path.join(BASE_DIR, "data")
 RESTAURANT_DATA_PATH = os.path.join(DATA_DIR, "df_merged_big.csv")
 NFH_DATA_PATH = os.path.join(DATA_DIR, "df_demo_clean.csv")
 
+# Numeric restaurant columns that are safe to store as float32
+FLOAT32_COLS = [
+    "latitude",
+    "longitude",
+    "score",
+    "nyc_poverty_rate",
+    "median_income",
+    "perc_white",
+    "perc_black",
+    "perc_asian",
+    "perc_other",
+    "perc_hispanic",
+    "indexscore",
+]
+
+# Only the columns the app reads downstream are parsed.
+# Alternate names (borough/boro, neighborhood variants, critical flag
+# variants) are listed so whichever one the file has gets picked up.
+REST_USECOLS = [
+    "dba",
+    "boro",
+    "borough",
+    "zipcode",
+    "cuisine_description",
+    "violation_code",
+    "critical_flag",
+    "critical_flag_bin",
+    "score",
+    "grade",
+    "latitude",
+    "longitude",
+    "neighborhood",
+    "neighborhoods",
+    "neighborhood_simple",
+    "nyc_poverty_rate",
+    "median_income",
+    "perc_white",
+    "perc_black",
+    "perc_asian",
+    "perc_other",
+    "perc_hispanic",
+    "indexscore",
+    "population",
+    "pop_missing",
+    "demo_missing",
+]
+REST_DTYPES = {
+    "cuisine_description": "category",
+    **{col: "float32" for col in FLOAT32_COLS},
+}
+
+NFH_USECOLS = [
+    "borough",
+    "neighborhood_simple",
+    "nyc_poverty_rate",
+    "median_income",
+    "perc_white",
+    "perc_black",
+    "perc_asian",
+    "perc_other",
+    "perc_hispanic",
+    "indexscore",
+]
+NFH_DTYPES = {
+    "borough": "category",
+    **{col: "float32" for col in NFH_USECOLS if col in FLOAT32_COLS},
+}
+
+# Everything that isn't a lowercase letter or whitespace
+_NEIGH_RE = re.compile(r"[^a-z\s]")
+
 
 # -------------------------------------------------
 # 1. Load datasets with Streamlit caching
 # -------------------------------------------------
 
+def _clean_categories(series, func):
+    """
+    Apply a string clean-up once per distinct value instead of once per row.
+    Borough has ~5 values and cuisine ~100, against ~24k rows.
+    Returns a categorical Series (NaN stays NaN).
+    """
+    return (
+        series.astype("category")
+        .map(func, na_action="ignore")
+        .astype("category")
+    )
+
+
+def _strip_title(value):
+    return str(value).strip().title()
+
+
+def _norm_neigh(series):
+    """
+    Normalizes neighborhood names for the borough + neighborhood merge:
+    lowercase, letters/spaces only, trimmed. Shared by both loaders so
+    the two sides of the join can't drift apart.
+    """
+    return _clean_categories(
+        series,
+        lambda v: _NEIGH_RE.sub("", str(v).lower()).strip(),
+    )
+
+
+def _read_csv_columns(csv_path, usecols, dtype):
+    """
+    pyarrow-engine read of the wanted columns the file actually has,
+    with dtypes applied while parsing.
+    """
+    header = pd.read_csv(csv_path, nrows=0).columns
+    cols = [col for col in usecols if col in header]
+
+    return pd.read_csv(
+        csv_path,
+        engine="pyarrow",
+        usecols=cols,
+        dtype={col: t for col, t in dtype.items() if col in cols},
+    )
+
+
+def _shared_categories(left, right):
+    """
+    Recasts two key columns onto ONE categories index so a merge can
+    join on the integer codes instead of comparing strings.
+    """
+    cats = pd.api.types.union_categoricals(
+        [left.astype("category"), right.astype("category")],
+        ignore_order=True,
+    ).categories
+    return (
+        left.astype(pd.CategoricalDtype(cats)),
+        right.astype(pd.CategoricalDtype(cats)),
+    )
+
+
+# Process umask (only readable by setting it), so cache files get the
+# same permissions a plain open() would give them
+_UMASK = os.umask(0o022)
+os.umask(_UMASK)
+
+
+def _read_feather(path):
+    """
+    Reads a cached Feather copy; None when it is missing or can't be
+    read (wrong owner/permissions, truncated or foreign file), so the
+    caller rebuilds instead of crashing.
+    """
+    try:
+        return pd.read_feather(path)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_feather(df, path):
+    """
+    Writes df to `path` as lz4 Feather, atomically: the data goes to a
+    temp file in the same directory which is then renamed over `path`,
+    so a crash or a concurrent writer never leaves a truncated file
+    for the next reader. Read-only deploys just skip the write.
+    """
+    try:
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(path), prefix=".tmp-", suffix=".feather"
+        )
+    except OSError:
+        return
+
+    try:
+        with os.fdopen(fd, "wb") as f:
+            df.to_feather(f, compression="lz4")
+        # mkstemp creates the file 0600 → readable by other users (e.g. a
+        # copy warmed during a docker build) like any normally created file
+        os.chmod(tmp_path, 0o666 & ~_UMASK)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _remove_stale_copies(pattern, keep, older_than=None):
+    """
+    Deletes cache files matching `pattern` other than `keep`
+    (when `older_than` is given: only those last written before it).
+    """
+    for path in glob.glob(pattern):
+        if path == keep:
+            continue
+        try:
+            if older_than is None or os.path.getmtime(path) < older_than:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def _load_or_cache_feather(csv_path, usecols, dtype):
+    """
+    Reads a CSV through a sibling '<csv>.<schema>.feather' copy.
+    The Feather (Arrow IPC) file is used when it is newer than the CSV;
+    otherwise the CSV is parsed once and the copy is (re)written next to it.
+    <schema> is a short hash of usecols + dtype, so changing either one
+    never serves a copy written with the old columns/types. An unreadable
+    copy is treated as a miss.
+    """
+    schema = hashlib.md5(repr((usecols, dtype)).encode()).hexdigest()[:8]
+    feather_path = f"{csv_path}.{schema}.feather"
+    csv_mtime = os.path.getmtime(csv_path)
+
+    if os.path.exists(feather_path) and os.path.getmtime(feather_path) >= csv_mtime:
+        df = _read_feather(feather_path)
+        if df is not None:
+            return df
+
+    df = _read_csv_columns(csv_path, usecols, dtype)
+
+    # Read-only deploy → the write is skipped, keep working from the CSV
+    _write_feather(df, feather_path)
+
+    # Copies (any schema) written before the CSV last changed can never be
+    # served again; copies other loaders still use are left alone
+    _remove_stale_copies(
+        f"{glob.escape(csv_path)}.*.feather", keep=feather_path, older_than=csv_mtime
+    )
+
+    return df
+
+
 @st.cache_data
 def load_restaurant_data():
     """
@@ -25,20 +254,33 @@ def load_restaurant_data():
     Must include: borough, zipcode, cuisine_description, score,
     critical_flag_bin, and coordinates for mapping.
     """
-    df = pd.read_csv(RESTAURANT_DATA_PATH)
+    df = _load_or_cache_feather(RESTAURANT_DATA_PATH, REST_USECOLS, REST_DTYPES)
 
     # Clean/standardize core fields
     if "borough" in df.columns:
-        df["borough"] = df["borough"].astype(str).str.strip().str.title()
+        df["borough"] = _clean_categories(df["borough"], _strip_title)
     elif "boro" in df.columns:
-        df["borough"] = df["boro"].astype(str).str.strip().str.title()
+        df["borough"] = _clean_categories(df["boro"], _strip_title)
     else:
         raise KeyError("❌ Neither 'borough' nor 'boro' found in dataset")
 
-    df['cuisine_description'] = df['cuisine_description'].astype(str).str.strip().str.title()
+    df['cuisine_description'] = _clean_categories(df['cuisine_description'], _strip_title)
 
     # Ensure zipcode is numeric
-    df['zipcode'] = pd.to_numeric(df['zipcode'], errors='coerce').fillna(0).astype(int)
+    df['zipcode'] = pd.to_numeric(df['zipcode'], errors='coerce').fillna(0).astype('uint32')
+
+    # Downcast numeric columns — float32 is plenty for scores, rates and
+    # coordinates, and halves the frame that gets cached and scanned
+    for col in FLOAT32_COLS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('float32')
+
+    if 'critical_flag_bin' in df.columns:
+        df['critical_flag_bin'] = df['critical_flag_bin'].astype('uint8')
+
+    # Rows without coordinates can't be mapped or clicked — drop them once
+    # here so the per-row marker / nearest-restaurant loops need no NaN guard.
+    df = df.dropna(subset=["latitude", "longitude"]).reset_index(drop=True)
 
     return df
 
@@ -51,20 +293,14 @@ def load_nfh_data():
     Uses 'neighborhood_simple' as the normalized neighborhood field.
     """
 
-    df = pd.read_csv(NFH_DATA_PATH)
+    df = _load_or_cache_feather(NFH_DATA_PATH, NFH_USECOLS, NFH_DTYPES)
 
     # Standardize borough
-    df["borough"] = df["borough"].astype(str).str.title().str.strip()
+    df["borough"] = _clean_categories(df["borough"], _strip_title)
 
     # Use the cleaned neighborhood column: 'neighborhood_simple'
     if "neighborhood_simple" in df.columns:
-        df["neighborhood"] = (
-            df["neighborhood_simple"]
-            .astype(str)
-            .str.lower()
-            .str.replace(r"[^a-z\s]", "", regex=True)
-            .str.strip()
-        )
+        df["neighborhood"] = _norm_neigh(df["neighborhood_simple"])
     else:
         raise KeyError("❌ 'neighborhood_simple' column not found in NFH dataset.")
 
@@ -76,8 +312,55 @@ def load_nfh_data():
 # 2. Merge Restaurant + NFH datasets
 # -------------------------------------------------
 
+def _merged_cache_key():
+    """
+    Hash of both source CSV mtimes, the column/dtype schemas and this
+    module's mtime: changes whenever editing either CSV or the merge
+    code should rebuild the merged frame (and what's derived from it).
+    """
+    return hashlib.md5(
+        (
+            f"{os.path.getmtime(RESTAURANT_DATA_PATH)}|{os.path.getmtime(NFH_DATA_PATH)}|"
+            f"{os.path.getmtime(__file__)}|"
+            f"{(REST_USECOLS, REST_DTYPES, NFH_USECOLS, NFH_DTYPES)!r}"
+        ).encode()
+    ).hexdigest()
+
+
+def _merged_cache_path():
+    """
+    On-disk location of the merged frame (see _merged_cache_key), in the
+    app's own data dir rather than the shared, world-writable temp dir.
+    """
+    return os.path.join(DATA_DIR, f"merged_{_merged_cache_key()}.feather")
+
+
 @st.cache_data
 def load_merged_data():
+    """
+    Returns the merged restaurant + NFH frame.
+    st.cache_data covers reruns inside one process; a Feather copy in
+    data/ covers restarts, so the CSV → normalize → merge pipeline only
+    runs when a source file changed (or the copy can't be read). Copies
+    keyed on older sources or code are deleted on rebuild.
+    """
+    cache_path = _merged_cache_path()
+
+    if os.path.exists(cache_path):
+        df_merged = _read_feather(cache_path)
+        if df_merged is not None:
+            return df_merged
+
+    df_merged = _build_merged_data()
+    _write_feather(df_merged, cache_path)
+    _remove_stale_copies(
+        os.path.join(glob.escape(DATA_DIR), "merged_*.feather"), keep=cache_path
+    )
+
+    return df_merged
+
+
+def _build_merged_data():
     """
     Merges restaurant data (df_merged_big.csv) with NFH demographics (df_demo_clean.csv)
     using borough + neighborhood, and safely fills missing demo values.
@@ -96,25 +379,24 @@ def load_merged_data():
             break
 
     if rest_neigh_col:
-        df_rest["neighborhood"] = (
-            df_rest[rest_neigh_col]
-            .astype(str)
-            .str.lower()
-            .str.replace(r"[^a-z\s]", "", regex=True)
-            .str.strip()
-        )
+        df_rest["neighborhood"] = _norm_neigh(df_rest[rest_neigh_col])
     else:
         # If no neighborhood column exists, still create it so merge doesn't break
         df_rest["neighborhood"] = None
 
     # ----------------------------
     # Merge with NFH data on borough + neighborhood
+    # (keys share categories on both sides → join on codes, no sorting)
     # ----------------------------
+    for key in ["borough", "neighborhood"]:
+        df_rest[key], df_nfh[key] = _shared_categories(df_rest[key], df_nfh[key])
+
     df_merged = pd.merge(
         df_rest,
         df_nfh,
         on=["borough", "neighborhood"],
         how="left",
+        sort=False,
         suffixes=("", "_nfh")
     )
 
@@ -131,15 +413,38 @@ def load_merged_data():
         "indexscore",
     ]
 
-    for col in required_demo_cols:
-        if col not in df_merged.columns:
-            # If the column is missing entirely, create it as NaN so code doesn't crash
-            df_merged[col] = pd.NA
+    # If a column is missing entirely, create it as NaN so code doesn't crash
+    # (one insertion for all of them instead of one per column)
+    missing = [col for col in required_demo_cols if col not in df_merged.columns]
+    if missing:
+        df_merged[missing] = pd.NA
+
+    # Fill missing demographic values using borough-level averages:
+    # one groupby for all columns gives a tiny borough → mean table,
+    # expanded to one fallback row per restaurant, then ONE fillna
+    # (aligned on column names) covers every column at once
+    borough_stats = (
+        df_merged.groupby("borough", observed=True, sort=False)[required_demo_cols]
+        .mean()
+    )
+    fallback = borough_stats.reindex(df_merged["borough"]).set_axis(df_merged.index)
 
-        # Fill missing demographic values using borough-level averages
-        df_merged[col] = df_merged.groupby("borough")[col].transform(
-            lambda x: x.fillna(x.mean())
-        )
+    df_merged[required_demo_cols] = (
+        df_merged[required_demo_cols].fillna(fallback).astype("float32")
+    )
+
+    # ----------------------------
+    # Drop dead weight before the frame is cached
+    # ----------------------------
+    # NFH columns that collided with restaurant columns come back as
+    # '<col>_nfh' duplicates nothing reads; the raw NFH neighborhood label
+    # is only needed for the join key.
+    df_merged = df_merged.drop(
+        columns=[c for c in df_merged.columns if c.endswith("_nfh")]
+        + ["neighborhood_simple"],
+        errors="ignore",
+    )
+    del df_rest, df_nfh, borough_stats, fallback
 
     return df_merged
 
@@ -153,66 +458,116 @@ def get_data():
     return load_merged_data()
 
 
-def load_demo_data():
+@st.cache_resource
+def get_shared_df():
     """
-    Loads df_demo_clean.csv for demographic lookup.
-    Returns a DataFrame indexed by ZIP code.
+    Returns ONE merged DataFrame shared by every rerun and session.
+    Unlike @st.cache_data, cache_resource does not copy on read,
+    so callers must treat the frame as read-only.
     """
-    path = os.path.join(DATA_DIR, "df_demo_clean.csv")
+    return load_merged_data()
 
-    df = pd.read_csv(path)
 
-    # Ensure ZIP is integer-like
-    if "zipcode" in df.columns:
-        df["zipcode"] = df["zipcode"].astype(int)
-        df = df.set_index("zipcode")
+# -------------------------------------------------
+# ZIP-keyed demographics (one row per ZIP)
+# -------------------------------------------------
+
+DEMO_LOOKUP_COLS = [
+    "nyc_poverty_rate",
+    "median_income",
+    "perc_white",
+    "perc_black",
+    "perc_asian",
+    "perc_other",
+    "perc_hispanic",
+    "indexscore",
+]
+
+
+def _first_row_per_zip(columns):
+    """
+    One row per known ZIP (zipcode 0 marks an unparseable ZIP),
+    indexed by the ZIP as a string to match Google's postal codes.
+    """
+    df = get_shared_df()
+    columns = [c for c in columns if c in df.columns]
+
+    df = df.loc[df["zipcode"] > 0, ["zipcode"] + columns]
+    df = df.drop_duplicates(subset=["zipcode"])
+    return df.set_index(df["zipcode"].astype(str))[columns]
 
-    return df
 
 # -------------------------------------------------
 # ZIP → demographic lookup for Google restaurants
 # -------------------------------------------------
 
 _zip_demo_cache = None
+_zip_demo_frame = None
+_zip_population = None
 
-def load_zip_demo_table():
+
+def _zip_demo_cache_path():
     """
-    Loads a ZIP → demographic table once into memory.
+    On-disk copy of the ZIP demographics frame in the app's data dir,
+    keyed exactly like the merged frame it is derived from (so it goes
+    stale with it).
     """
-    global _zip_demo_cache
-    if _zip_demo_cache is not None:
-        return _zip_demo_cache
+    return os.path.join(DATA_DIR, f"zipdemo_{_merged_cache_key()}.feather")
 
-    # Load merged dataset that contains ZIP demographics
-    base_dir = os.path.dirname(os.path.dirname(__file__))
-    path = os.path.join(base_dir, "data", "df_merged_big.csv")
 
-    df = pd.read_csv(path)
+def load_zip_demo_frame():
+    """
+    ZIP-indexed demographics DataFrame (ZIP strings as the index),
+    loaded once. Used by the batched feature builder to join many ZIPs
+    in one reindex; load_zip_demo_table() is its dict form.
+    A Feather copy in data/ lets a restarted process (e.g. one that only
+    predicts) skip loading the whole merged frame for it.
+    """
+    global _zip_demo_frame
+    if _zip_demo_frame is not None:
+        return _zip_demo_frame
+
+    cache_path = _zip_demo_cache_path()
+    _remove_stale_copies(
+        os.path.join(glob.escape(DATA_DIR), "zipdemo_*.feather"), keep=cache_path
+    )
+
+    cached = _read_feather(cache_path) if os.path.exists(cache_path) else None
+    if cached is not None:
+        _zip_demo_frame = cached.set_index("zipcode")
+        return _zip_demo_frame
 
     # Keep ZIP + demo columns
-    keep = [
-        "zipcode",
-        "population",
-        "nyc_poverty_rate",
-        "median_income",
-        "perc_white",
-        "perc_black",
-        "perc_asian",
-        "perc_other",
-        "perc_hispanic",
-        "indexscore"
-    ]
-    df = df[keep].drop_duplicates(subset=["zipcode"])
+    frame = _first_row_per_zip(["population"] + DEMO_LOOKUP_COLS)
 
-    df["zipcode"] = df["zipcode"].astype(str)
+    # Feather has no index → the ZIP index is stored as a column
+    _write_feather(frame.reset_index(), cache_path)
 
-    _zip_demo_cache = df.set_index("zipcode").to_dict(orient="index")
+    _zip_demo_frame = frame
+    return _zip_demo_frame
+
+
+def load_zip_demo_table():
+    """
+    Loads a ZIP → demographic table once into memory.
+    Derived from the shared merged frame (already loaded and disk-cached),
+    so the raw CSV is never re-parsed just for this lookup.
+    Rows are read-only views: every caller shares the same row objects.
+    """
+    global _zip_demo_cache
+    if _zip_demo_cache is not None:
+        return _zip_demo_cache
+
+    _zip_demo_cache = {
+        zipcode: MappingProxyType(row)
+        for zipcode, row in load_zip_demo_frame().to_dict(orient="index").items()
+    }
     return _zip_demo_cache
 
 
 def lookup_zip_demo(zipcode: str):
     """
-    Return demo dictionary from ZIP code.
+    Return the (read-only) demo mapping for a ZIP code.
     If ZIP not found → return None.
     """
     if not zipcode:
@@ -223,3 +578,27 @@ def lookup_zip_demo(zipcode: str):
     zipcode = str(zipcode).strip()
     return table.get(zipcode)
 
+
+def get_demographics_lookup():
+    """
+    Returns {zipcode: {demo_col: value}} for google_place_to_ml_features:
+    the load_zip_demo_table() rows themselves (read-only, shared).
+    """
+    return load_zip_demo_table()
+
+
+def get_population_lookup():
+    """
+    Returns {zipcode: population}, built once from load_zip_demo_frame().
+    Shared — callers must not mutate it.
+    """
+    global _zip_population
+    if _zip_population is not None:
+        return _zip_population
+
+    frame = load_zip_demo_frame()
+    if "population" not in frame.columns:
+        _zip_population = {}
+    else:
+        _zip_population = frame["population"].to_dict()
+    return _zip_population
@@ -1,6 +1,129 @@
-import requests
+import orjson
+import requests_cache
 import os
-import urllib.parse
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import streamlit as st
+
+
+# HTTP cache lives in the app's own data dir (not the shared temp dir)
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+GMAPS_CACHE_PATH = os.path.join(BASE_DIR, "data", "gmaps_cache")
+
+# One pooled session for every Google call → TCP/TLS connections to
+# maps.googleapis.com are kept alive and reused instead of re-opened.
+# Successful answers are persisted on disk for a week (keyed on the URL
+# minus the API key), so repeat lookups survive restarts and skip the
+# network. Responses are stored as JSON, never pickled. Only HTTP 200s
+# are stored, and _google_get evicts any whose Google status is a
+# failure. Rate-limit / transient 5xx answers are retried with a short
+# backoff.
+_SESSION = requests_cache.CachedSession(
+    GMAPS_CACHE_PATH,
+    backend="sqlite",
+    serializer="json",
+    expire_after=7 * 86400,
+    allowable_methods=["GET"],
+    ignored_parameters=["key"],
+)
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=16,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.2,
+            status_forcelist=[429, 500, 502, 503, 504],
+            # Out of retries → hand back the last response instead of
+            # raising RetryError, so callers' status checks handle it
+            raise_on_status=False,
+        ),
+    ),
+)
+
+# (connect, read) seconds
+_TIMEOUT = (3, 10)
+
+# At most this many Google requests in flight at once, however many
+# thread pools fan out
+_GOOGLE_SLOTS = threading.BoundedSemaphore(10)
+
+
+class _TokenBucket:
+    """
+    Thread-safe token bucket: `rate` requests/second sustained,
+    bursts of up to `burst`. acquire() sleeps until a token is free.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.burst, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# Outgoing (non-cached) Google calls are paced below the QPS quota, so a
+# busy page doesn't trip OVER_QUERY_LIMIT / 429 and the retry backoff.
+# Tunable per deployment via env vars.
+_GOOGLE_RATE = _TokenBucket(
+    rate=float(os.environ.get("GOOGLE_MAPS_RPS", 10)),
+    burst=int(os.environ.get("GOOGLE_MAPS_BURST", 20)),
+)
+
+
+# Google statuses worth keeping in the HTTP cache
+_CACHEABLE_STATUSES = ("OK", "ZERO_RESULTS")
+
+
+def _google_get(url, params):
+    """
+    GET a Google Maps endpoint on the shared session → parsed JSON
+    (decoded with orjson straight from the raw bytes).
+    Cache hits are answered straight away; only real network calls
+    wait for a concurrency slot and a rate-limit token.
+    """
+    resp = _SESSION.get(url, params=params, timeout=_TIMEOUT, only_if_cached=True)
+
+    if resp.status_code == 504:  # not in the cache
+        with _GOOGLE_SLOTS:
+            _GOOGLE_RATE.acquire()
+            resp = _SESSION.get(url, params=params, timeout=_TIMEOUT)
+
+    try:
+        data = orjson.loads(resp.content)
+    except orjson.JSONDecodeError:
+        # e.g. an HTML 5xx page left over after the retries → no status,
+        # no results, which every caller already treats as a failed lookup
+        data = {}
+
+    # Cacheability is decided here, on the one decode, rather than in a
+    # filter_fn (which requests-cache runs on every response, hits included)
+    if data.get("status") not in _CACHEABLE_STATUSES:
+        # Don't keep failures (REQUEST_DENIED, OVER_QUERY_LIMIT, ...) → retried
+        _SESSION.cache.delete(resp.cache_key)
+
+    return data
 
 # Dynamically load the API key each time
 def get_api_key():
@@ -12,18 +135,50 @@ def get_api_key():
 # -------------------------------------------------
 # 2. Google Place Details
 # -------------------------------------------------
+# place_id → Future of the details request currently on the wire
+_INFLIGHT_DETAILS = {}
+_INFLIGHT_LOCK = threading.Lock()
+
+
 def google_place_details(place_id):
+    """
+    Place Details for one place_id.
+    Concurrent calls for the same place_id are coalesced: the first
+    caller does the request, the others wait on its result.
+    """
+    with _INFLIGHT_LOCK:
+        fut = _INFLIGHT_DETAILS.get(place_id)
+        leader = fut is None
+        if leader:
+            fut = _INFLIGHT_DETAILS[place_id] = Future()
+
+    if not leader:
+        return fut.result()
+
+    try:
+        result = _fetch_place_details(place_id)
+    except BaseException as e:
+        fut.set_exception(e)
+        raise
+    else:
+        fut.set_result(result)
+    finally:
+        with _INFLIGHT_LOCK:
+            _INFLIGHT_DETAILS.pop(place_id, None)
+
+    return result
+
+
+def _fetch_place_details(place_id):
     API_KEY = get_api_key()
     if not API_KEY:
         return {}
 
-    url = (
-        "https://maps.googleapis.com/maps/api/place/details/json"
-        f"?place_id={place_id}&key={API_KEY}"
+    resp = _google_get(
+        "https://maps.googleapis.com/maps/api/place/details/json",
+        {"place_id": place_id, "key": API_KEY},
     )
 
-    resp = requests.get(url).json()
-
     if resp.get("status") != "OK":
         return {}
 
@@ -33,18 +188,29 @@ def google_place_details(place_id):
 # -------------------------------------------------
 # 3. Reverse Geocoding
 # -------------------------------------------------
+# Address-component name (borough or county) → canonical borough
+_BORO_MAP = {
+    "manhattan": "Manhattan",
+    "new york county": "Manhattan",
+    "bronx": "Bronx",
+    "brooklyn": "Brooklyn",
+    "kings county": "Brooklyn",
+    "queens": "Queens",
+    "staten island": "Staten Island",
+    "richmond county": "Staten Island",
+}
+_BORO_RE = re.compile("|".join(map(re.escape, _BORO_MAP)))
+
 def reverse_geocode(lat, lng):
     API_KEY = get_api_key()
     if not API_KEY:
         return None, None, None
 
-    url = (
-        "https://maps.googleapis.com/maps/api/geocode/json"
-        f"?latlng={lat},{lng}&key={API_KEY}"
+    resp = _google_get(
+        "https://maps.googleapis.com/maps/api/geocode/json",
+        {"latlng": f"{lat},{lng}", "key": API_KEY},
     )
 
-    resp = requests.get(url).json()
-
     zipcode = None
     borough = None
     address = None
@@ -63,32 +229,77 @@ def reverse_geocode(lat, lng):
 
             # -------------------------------
             # Correct Borough Detection
+            # (one regex scan instead of ten substring checks)
             # -------------------------------
-            if "manhattan" in low or "new york county" in low:
-                borough = "Manhattan"
-            elif "bronx" in low or "bronx county" in low:
-                borough = "Bronx"
-            elif "brooklyn" in low or "kings county" in low:
-                borough = "Brooklyn"
-            elif "queens" in low or "queens county" in low:
-                borough = "Queens"
-            elif "staten island" in low or "richmond county" in low:
-                borough = "Staten Island"
+            m = _BORO_RE.search(low)
+            if m:
+                borough = _BORO_MAP[m.group(0)]
 
     return zipcode, borough, address
 
 
-
 # -------------------------------------------------
-# 5. Normalize Place Details → Model Input
+# 4. Cached lookups (repeat clicks skip the network)
 # -------------------------------------------------
+class _LookupFailed(Exception):
+    """
+    Raised inside a cached lookup that came back empty (no API key,
+    non-OK status, no results). st.cache_data doesn't memoize raised
+    calls, so a failure is retried next time instead of being served
+    from the cache for a day.
+    """
+
+
+@st.cache_data(ttl=86400, max_entries=10_000, show_spinner=False)
+def _reverse_geocode_rounded(lat_q, lng_q):
+    result = reverse_geocode(lat_q, lng_q)
+    if result == (None, None, None):
+        raise _LookupFailed
+    return result
+
+
+def cached_reverse_geocode(lat, lng):
+    """
+    reverse_geocode() cached for a day (successful answers only).
+    Coordinates are rounded to 5 decimals (~1 m) so clicks on the
+    same marker share a cache key instead of never repeating.
+    """
+    try:
+        return _reverse_geocode_rounded(round(lat, 5), round(lng, 5))
+    except _LookupFailed:
+        return None, None, None
+
+
+@st.cache_data(ttl=86400, max_entries=10_000, show_spinner=False)
+def _place_details_cached(place_id):
+    details = google_place_details(place_id)
+    if not details:
+        raise _LookupFailed
+    return details
+
+
+def cached_place_details(place_id):
+    """
+    google_place_details() cached for a day, keyed on place_id
+    (successful answers only; failures return {} and are retried).
+    """
+    try:
+        return _place_details_cached(place_id)
+    except _LookupFailed:
+        return {}
+
+
+
 # -------------------------------------------------
 # 5. Normalize Place Details → Model Input
 # -------------------------------------------------
-def normalize_place_to_restaurant(details):
+def normalize_place_to_restaurant(details, geocode=None):
     """
     Convert Google Place Details into the raw restaurant dictionary.
     This will be later enriched with demographics via ZIP lookup.
+
+    geocode: an already-fetched (zipcode, borough, address) tuple;
+    when omitted the place's coordinates are reverse-geocoded here.
     """
 
     # 1. Extract base info
@@ -98,8 +309,10 @@ def normalize_place_to_restaurant(details):
     lat = details["geometry"]["location"]["lat"]
     lng = details["geometry"]["location"]["lng"]
 
-    # 2. Reverse geocode → ZIP + borough
-    zipcode, borough, _addr = reverse_geocode(lat, lng)
+    # 2. Reverse geocode → ZIP + borough (cached on rounded coordinates)
+    if geocode is None:
+        geocode = cached_reverse_geocode(lat, lng)
+    zipcode, borough, _addr = geocode
 
     zipcode = str(zipcode) if zipcode else "00000"
     if not borough:
@@ -132,9 +345,80 @@ def normalize_place_to_restaurant(details):
     }
 
 
+def normalize_places_batch(details_list, max_workers=10):
+    """
+    normalize_place_to_restaurant() over many places at once.
+    Each place costs a reverse-geocode round trip, so those calls are
+    overlapped on a thread pool (I/O bound → the GIL isn't the limit).
+    Every place needs details with coordinates. Results keep the input order.
+    """
+    if not details_list:
+        return []
+
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        geocodes = list(
+            ex.map(lambda d: cached_reverse_geocode(*_place_latlng(d)), details_list)
+        )
+
+    return [
+        normalize_place_to_restaurant(d, geocode=g)
+        for d, g in zip(details_list, geocodes)
+    ]
+
+
+def _place_latlng(details):
+    loc = details["geometry"]["location"]
+    return loc["lat"], loc["lng"]
+
+
+def enrich_places(place_ids, max_workers=10):
+    """
+    place_ids (e.g. from a nearby search) → normalized restaurant dicts.
+    Details are fetched concurrently, then normalize_places_batch() does
+    the concurrent reverse-geocode pass. Places without details or
+    coordinates are dropped, so each dict carries its "place_id" for
+    matching back to the input; the remaining places keep their input order.
+    """
+    if not place_ids:
+        return []
+
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        found = [
+            (pid, d)
+            for pid, d in zip(place_ids, ex.map(cached_place_details, place_ids))
+            if d and "geometry" in d
+        ]
+
+    restaurants = normalize_places_batch(
+        [d for _, d in found], max_workers=max_workers
+    )
+
+    return [
+        {"place_id": pid, **restaurant}
+        for (pid, _), restaurant in zip(found, restaurants)
+    ]
+
+
 
 
 
+# Google 'types' keyword → cuisine label (built once, not per call)
+CUISINE_MAP = {
+    "fast_food": "Fast Food",
+    "pizza": "Pizza",
+    "cafe": "Cafe",
+    "bar": "Bar",
+    "bakery": "Bakery",
+    "seafood": "Seafood",
+    "steakhouse": "Steakhouse",
+    "sandwich": "Sandwiches",
+    "deli": "Deli",
+}
+
+# All CUISINE_MAP keys as one alternation → a type string is scanned once
+_CUISINE_RE = re.compile("|".join(map(re.escape, CUISINE_MAP)))
+
+
 def map_google_types_to_cuisine(types_list):
     """
     Converts Google Place 'types' into a cuisine string for the ML model.
@@ -143,26 +427,19 @@ def map_google_types_to_cuisine(types_list):
         return "Unknown"
 
     # Priority 1: Look for tags like 'mexican_restaurant', 'chinese_restaurant'
+    tagged = next((t for t in types_list if t.endswith("_restaurant")), None)
+    if tagged is not None:
+        return tagged.replace("_restaurant", "").replace("_", " ").title()
+
+    # Priority 2: Common food categories.
+    # Most types are exact tokens ('cafe', 'bar') → one dict probe;
+    # only fall back to the (single regex) substring scan when that misses.
     for t in types_list:
-        if t.endswith("_restaurant"):
-            return t.replace("_restaurant", "").replace("_", " ").title()
-
-    # Priority 2: Common food categories
-    keyword_map = {
-        "fast_food": "Fast Food",
-        "pizza": "Pizza",
-        "cafe": "Cafe",
-        "bar": "Bar",
-        "bakery": "Bakery",
-        "seafood": "Seafood",
-        "steakhouse": "Steakhouse",
-        "sandwich": "Sandwiches",
-        "deli": "Deli",
-    }
-    for t in types_list:
-        for key, val in keyword_map.items():
-            if key in t:
-                return val
+        if t in CUISINE_MAP:
+            return CUISINE_MAP[t]
+        m = _CUISINE_RE.search(t)
+        if m:
+            return CUISINE_MAP[m.group(0)]
 
     # Default fallback
     return "Other"
@@ -177,13 +454,16 @@ def google_nearby_restaurants(lat, lng, radius=800):
     if not API_KEY:
         return []
 
-    url = (
-        "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
-        f"?location={lat},{lng}&radius={radius}&type=restaurant&key={API_KEY}"
+    resp = _google_get(
+        "https://maps.googleapis.com/maps/api/place/nearbysearch/json",
+        {
+            "location": f"{lat},{lng}",
+            "radius": radius,
+            "type": "restaurant",
+            "key": API_KEY,
+        },
     )
 
-    resp = requests.get(url).json()
-
     if resp.get("status") not in ["OK", "ZERO_RESULTS"]:
         return []
 
@@ -198,6 +478,12 @@ def google_place_to_ml_features(details, demographics_lookup=None, population_lo
     """
     Convert Google Place Details into the full ML feature set
     required by predictor.py.
+
+    demographics_lookup: dict {zipcode: {demo_col: value}}
+    population_lookup:   dict {zipcode: population}
+    Both must be plain dicts keyed by ZIP string (see
+    data_loader.get_demographics_lookup / get_population_lookup);
+    a DataFrame would turn each probe into a scan + Series slice.
     """
 
     base = normalize_place_to_restaurant(details)
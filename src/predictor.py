@@ -1,11 +1,16 @@
 import json
+import logging
 import os
+from functools import lru_cache
+from operator import itemgetter
 
 import joblib
 import pandas as pd
 import streamlit as st
 
-from src.utils import build_feature_vector_from_raw
+from src.utils import build_feature_vector_from_raw, build_feature_vectors_from_raw
+
+log = logging.getLogger(__name__)
 
 # -------------------------------------------------
 # PATHS
@@ -22,14 +27,25 @@ META_PATH = os.path.join(BASE_DIR, "models", "model_metadata.json")
 
 @st.cache_resource
 def load_model():
-    print("Loading model from:", MODEL_PATH)
+    log.info("Loading model from: %s", MODEL_PATH)
     model = joblib.load(MODEL_PATH)
-    print("Model loaded OK!")
+    log.info("Model loaded OK!")
+
+    # The forest was pickled with its training n_jobs=-1, which spins up
+    # a joblib worker pool on every predict call — pure overhead when
+    # scoring one row (or a page of rows) at a time.
+    estimator = model.steps[-1][1] if hasattr(model, "steps") else model
+    if hasattr(estimator, "n_jobs"):
+        estimator.n_jobs = 1
+
     return model
 
 
 model = load_model()
 
+# Class labels as plain Python values, converted once instead of per call
+_CLASSES = tuple(model.classes_.tolist()) if hasattr(model, "classes_") else ()
+
 try:
     with open(META_PATH, "r") as f:
         metadata = json.load(f)
@@ -40,53 +56,56 @@ FEATURE_COLUMNS = metadata["feature_columns"]
 ENCODERS = metadata.get("encoders", {})
 SCALER_NEEDED = metadata.get("scaler_needed", False)
 
+# Feature dict → row tuple in FEATURE_COLUMNS order, in one C-level call
+_row_getter = itemgetter(*FEATURE_COLUMNS)
+
 
 # -------------------------------------------------
-# Helper: dict → DataFrame with correct column order
+# Core prediction helpers
 # -------------------------------------------------
 
-def to_dataframe(feature_dict: dict) -> pd.DataFrame:
+@lru_cache(maxsize=8192)
+def _predict_cached(row: tuple):
     """
-    Convert feature dict → DataFrame with columns in FEATURE_COLUMNS order.
-    Missing expected features are filled with 0.
+    Model call for one feature row (values in FEATURE_COLUMNS order).
+    The model is deterministic in its inputs, so repeat rows (same
+    restaurant clicked again, duplicate nearby results) skip the
+    DataFrame build + tree traversal entirely.
+    Returns (grade, ((label, prob), ...)) — immutable, safe to share.
     """
-    row = [feature_dict.get(col, 0) for col in FEATURE_COLUMNS]
+    X = pd.DataFrame([row], columns=FEATURE_COLUMNS)
 
-    # Debug (you can comment these out later)
-    
-    for k, v in feature_dict.items():
-        print(k, type(v), v)
+    if hasattr(model, "predict_proba"):
+        # One traversal gives both outputs: the grade is the most
+        # probable class (exactly what predict() computes internally)
+        probs_raw = model.predict_proba(X)[0]
+        pred = _CLASSES[probs_raw.argmax()]
+        probs = tuple(zip(_CLASSES, probs_raw.tolist()))
+    else:
+        pred = model.predict(X)[0]
+        probs = ()
 
-    X = pd.DataFrame([row], columns=FEATURE_COLUMNS)
-    return X
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("row to model: %s", X.iloc[0].to_dict())
 
+    return pred, probs
 
-# -------------------------------------------------
-# Core prediction helpers
-# -------------------------------------------------
 
 def predict_from_features(feature_dict: dict) -> dict:
     """
     Predict using a prepared feature dictionary.
     """
-    X = to_dataframe(feature_dict)
-
-    pred = model.predict(X)[0]
-
-    if hasattr(model, "predict_proba"):
-        probs_raw = model.predict_proba(X)[0]
-        prob_dict = {
-            label: float(p)
-            for label, p in zip(model.classes_, probs_raw)
-        }
-    else:
-        prob_dict = {}
-
-    print(X)
+    try:
+        # build_feature_vector_from_raw always fills every column
+        row = _row_getter(feature_dict)
+    except KeyError:
+        # Hand-built dicts may leave columns out → fill with 0
+        row = tuple(feature_dict.get(col, 0) for col in FEATURE_COLUMNS)
+    pred, probs = _predict_cached(row)
 
     return {
         "grade": pred,
-        "probabilities": prob_dict,
+        "probabilities": dict(probs),
         "features_used": feature_dict,
     }
 
@@ -102,8 +121,43 @@ def predict_from_raw_restaurant(raw_dict: dict) -> dict:
 
     Steps:
       1. build_feature_vector_from_raw(raw_dict)  → strict feature dict
-      2. to_dataframe(feature_dict)              → DataFrame with correct columns
-      3. model.predict / predict_proba
+      2. predict_from_features(feature_dict)     → row in FEATURE_COLUMNS order
+      3. model.predict_proba (memoized per row)
     """
     features = build_feature_vector_from_raw(raw_dict)
     return predict_from_features(features)
+
+
+def predict_batch(raw_list: list) -> list:
+    """
+    predict_from_raw_restaurant() for many restaurants at once.
+
+    raw_list: list of raw dicts, or a DataFrame of raw rows.
+    Builds ONE N-row DataFrame and calls the model once, instead of
+    paying DataFrame construction + pipeline overhead per restaurant
+    (e.g. a page of Google nearby results).
+    Returns one result dict per input, in input order.
+    """
+    if len(raw_list) == 0:
+        return []
+
+    features_df = build_feature_vectors_from_raw(raw_list)
+    X = features_df.reindex(columns=FEATURE_COLUMNS, fill_value=0)
+    features = features_df.to_dict(orient="records")
+
+    if hasattr(model, "predict_proba"):
+        probs = model.predict_proba(X)
+        preds = [_CLASSES[i] for i in probs.argmax(axis=1).tolist()]
+        prob_dicts = [dict(zip(_CLASSES, row)) for row in probs.tolist()]
+    else:
+        preds = model.predict(X)
+        prob_dicts = [{} for _ in features]
+
+    return [
+        {
+            "grade": pred,
+            "probabilities": prob_dict,
+            "features_used": feature_dict,
+        }
+        for pred, prob_dict, feature_dict in zip(preds, prob_dicts, features)
+    ]
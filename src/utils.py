@@ -1,3 +1,8 @@
+import sys
+from functools import lru_cache
+from html import escape
+
+import numpy as np
 import pandas as pd
 
 # -------------------------------------------------
@@ -13,9 +18,23 @@ GRADE_COLORS = {
 }
 
 
+_DEFAULT_GRADE_COLOR = "#95A5A6"
+
+# Upper- and lower-case keys precomputed, so the usual grade letters
+# resolve with a single dict probe (no str()/upper() per marker)
+_GRADE_COLOR_LOOKUP = {
+    **GRADE_COLORS,
+    **{grade.lower(): color for grade, color in GRADE_COLORS.items()},
+}
+
+
 def get_grade_color(grade: str) -> str:
     """Return the hex color associated with a grade letter."""
-    return GRADE_COLORS.get(str(grade).upper(), "#95A5A6")
+    try:
+        return _GRADE_COLOR_LOOKUP[grade]
+    except (KeyError, TypeError):
+        # Anything else (NaN, None, padded/odd values) → old normalization
+        return GRADE_COLORS.get(str(grade).upper(), _DEFAULT_GRADE_COLOR)
 
 
 # -------------------------------------------------
@@ -27,11 +46,22 @@ def format_probabilities(prob_dict: dict):
     Convert { 'A': 0.87, 'B': 0.09, ... } into
     a sorted list of (grade, percent) pairs for UI.
     """
-    formatted = [
-        (grade, round(float(prob) * 100.0, 2))
-        for grade, prob in prob_dict.items()
-    ]
-    return sorted(formatted, key=lambda x: x[1], reverse=True)
+    # A handful of grade classes: plain Python beats NumPy's array setup
+    if len(prob_dict) <= 8:
+        formatted = [
+            (grade, round(float(prob) * 100.0, 2))
+            for grade, prob in prob_dict.items()
+        ]
+        return sorted(formatted, key=lambda x: x[1], reverse=True)
+
+    grades = list(prob_dict)
+    pct = np.round(
+        np.fromiter(prob_dict.values(), dtype=np.float64, count=len(grades)) * 100.0,
+        2,
+    )
+    # Stable sort on the negated values → ties keep their input order
+    order = np.argsort(-pct, kind="stable")
+    return [(grades[i], pct[i].item()) for i in order.tolist()]
 
 
 # -------------------------------------------------
@@ -40,14 +70,23 @@ def format_probabilities(prob_dict: dict):
 
 def clean_zip(zip_value):
     """Ensure ZIP codes become integers or None."""
+    # Common cases first: already an int, or a plain digit string
+    if type(zip_value) is int:
+        return zip_value
+    if isinstance(zip_value, str) and zip_value.isdecimal():
+        return int(zip_value)
+
     try:
         return int(zip_value)
-    except Exception:
+    except (TypeError, ValueError, OverflowError):
         return None
 
 
 def normalize_text(text):
     """Simple helper for cleaning cuisine/borough search inputs."""
+    # Plain strings (the usual widget input) can't be missing → skip pd.isna
+    if isinstance(text, str):
+        return text.strip().title()
     if pd.isna(text):
         return ""
     return str(text).strip().title()
@@ -57,77 +96,194 @@ def normalize_text(text):
 # 4. Borough normalization (single source of truth)
 # -------------------------------------------------
 
+# Lowercased borough spelling / county name → canonical borough
+# (built once at import, not on every call)
+_BORO_NORM = {
+    "manhattan": "Manhattan",
+    "new york": "Manhattan",
+    "ny": "Manhattan",
+
+    "bronx": "Bronx",
+
+    "brooklyn": "Brooklyn",
+    "kings": "Brooklyn",
+    "kings county": "Brooklyn",
+
+    "queens": "Queens",
+    "queens county": "Queens",
+
+    "staten island": "Staten Island",
+    "statenisl": "Staten Island",
+    "staten": "Staten Island",
+    "richmond": "Staten Island",
+    "richmond county": "Staten Island",
+}
+
+
+@lru_cache(maxsize=64)
 def normalize_borough(boro):
     """
     Clean borough names so everything is consistent for the ML model.
+    Inputs are a small closed set of spellings, so results are memoized
+    (and interned: every row shares one string object per borough).
     """
     if not boro:
         return "Unknown"
 
     boro = str(boro).strip().lower()
 
-    mapping = {
-        "manhattan": "Manhattan",
-        "new york": "Manhattan",
-        "ny": "Manhattan",
+    return sys.intern(_BORO_NORM.get(boro, boro.title()))
 
-        "bronx": "Bronx",
 
-        "brooklyn": "Brooklyn",
-        "kings": "Brooklyn",
-        "kings county": "Brooklyn",
+def normalize_borough_series(values) -> pd.Series:
+    """
+    normalize_borough() over a whole column (Series or list) with
+    vectorized string ops; same results value for value.
+    """
+    s = pd.Series(values, dtype=object)
 
-        "queens": "Queens",
-        "queens county": "Queens",
+    key = s.astype(str).str.strip().str.lower()
+    out = key.map(_BORO_NORM).fillna(key.str.title())
 
-        "staten island": "Staten Island",
-        "statenisl": "Staten Island",
-        "staten": "Staten Island",
-        "richmond": "Staten Island",
-        "richmond county": "Staten Island",
-    }
+    # Falsy inputs (None, "", 0) → "Unknown", exactly like the scalar check
+    return out.where(s.astype(bool), "Unknown")
 
-    return mapping.get(boro, boro.title())
+
+# -------------------------------------------------
+# 5. Geometry helpers (map clicks)
+# -------------------------------------------------
+
+def dist2(lat1, lon1, lat2, lon2):
+    """Squared lat/lon distance — enough to rank nearby markers."""
+    return (lat1 - lat2) ** 2 + (lon1 - lon2) ** 2
 
 
 # -------------------------------------------------
-# 5. Map popup HTML helper
+# 6. Map popup HTML helper
 # -------------------------------------------------
 
+# Popup markup, parsed once; filled per marker with printf-style %
+_POPUP_TMPL = """
+    <div style="font-size:14px;">
+        <b>%(name)s</b><br>
+        <span>Cuisine: %(cuisine)s</span><br>
+        <span>Borough: %(borough)s</span><br>
+        <span>ZIP: %(zipcode)s</span><br>
+        <span>Score: %(score)s</span><br>
+        <span>Grade: <b style='color:%(color)s;'>%(grade)s</b></span>
+    </div>
+    """
+
+
+def _fill_popup(name, cuisine, borough, zipcode, score, grade):
+    """Fill the popup template; every value is HTML-escaped."""
+    return _POPUP_TMPL % {
+        "name": escape(str(name)),
+        "cuisine": escape(str(cuisine)),
+        "borough": escape(str(borough)),
+        "zipcode": escape(str(zipcode)),
+        "score": escape(str(score)),
+        "color": get_grade_color(grade),
+        "grade": escape(str(grade)),
+    }
+
+
 def restaurant_popup_html(row):
     """
     Builds the HTML used in popups on the map for folium.
     Works for both dataset rows and normalized Google places
     as long as they have these fields where possible.
     """
-    name = row.get("dba") or row.get("DBA") or row.get("name") or "Unknown Restaurant"
-    cuisine = row.get("cuisine_description", "Unknown")
-    borough = row.get("borough") or row.get("boro", "Unknown")
-    zipcode = row.get("zipcode", "")
-    score = row.get("score", "")
-    grade = row.get("grade", "N/A")
+    if isinstance(row, pd.Series):
+        # One pass over the row → plain dict, instead of up to 8
+        # Series.get index probes below
+        row = dict(zip(row.index, row.values))
+
+    return _fill_popup(
+        row.get("dba") or row.get("DBA") or row.get("name") or "Unknown Restaurant",
+        row.get("cuisine_description", "Unknown"),
+        row.get("borough") or row.get("boro", "Unknown"),
+        row.get("zipcode", ""),
+        row.get("score", ""),
+        row.get("grade", "N/A"),
+    )
 
-    color = get_grade_color(grade)
 
-    html = f"""
-    <div style="font-size:14px;">
-        <b>{name}</b><br>
-        <span>Cuisine: {cuisine}</span><br>
-        <span>Borough: {borough}</span><br>
-        <span>ZIP: {zipcode}</span><br>
-        <span>Score: {score}</span><br>
-        <span>Grade: <b style='color:{color};'>{grade}</b></span>
-    </div>
+def restaurant_popups_html(df):
+    """
+    restaurant_popup_html() for every row of a DataFrame at once.
+    Columns are pulled out as plain lists once per frame (no per-row
+    Series), then the template is filled row by row.
+    Returns a list of HTML strings in row order.
     """
-    return html
+    n = len(df)
+
+    def col(name, default=None):
+        return df[name].tolist() if name in df.columns else [default] * n
+
+    names = [
+        a or b or c or "Unknown Restaurant"
+        for a, b, c in zip(col("dba"), col("DBA"), col("name"))
+    ]
+    boroughs = [
+        b or (o if "boro" in df.columns else "Unknown")
+        for b, o in zip(col("borough"), col("boro"))
+    ]
+
+    return [
+        _fill_popup(*fields)
+        for fields in zip(
+            names,
+            col("cuisine_description", "Unknown"),
+            boroughs,
+            col("zipcode", ""),
+            col("score", ""),
+            col("grade", "N/A"),
+        )
+    ]
 
 
 # -------------------------------------------------
-# 6. Build full feature vector for ANY restaurant
+# 7. Build full feature vector for ANY restaurant
 # -------------------------------------------------
 # This is the main “engine” used by predictor.py.
 
-from src.data_loader import lookup_zip_demo  # noqa: E402
+from src.data_loader import load_zip_demo_frame, lookup_zip_demo  # noqa: E402
+
+# Demographic features (in model column order) and the values used when
+# a ZIP isn't in the lookup table
+_DEMO_DEFAULTS = {
+    "nyc_poverty_rate": 0.20,
+    "median_income": 30000,
+    "perc_white": 0.30,
+    "perc_black": 0.30,
+    "perc_asian": 0.15,
+    "perc_other": 0.05,
+    "perc_hispanic": 0.20,
+    "indexscore": 4.0,
+    "population": 50000,
+}
+
+
+def _to_score(score):
+    """Score → float; 12.0 (mid-range) when it can't be parsed."""
+    # Already numeric (the common case) → no exception machinery
+    if type(score) is float:
+        return score
+    try:
+        return float(score)
+    except (TypeError, ValueError, OverflowError):
+        return 12.0
+
+
+def _to_flag(crit):
+    """Critical flag → int; 0 when it can't be parsed."""
+    if type(crit) is int:
+        return crit
+    try:
+        return int(crit)
+    except (TypeError, ValueError, OverflowError):
+        return 0
 
 
 def build_feature_vector_from_raw(raw: dict) -> dict:
@@ -136,7 +292,7 @@ def build_feature_vector_from_raw(raw: dict) -> dict:
     model-ready feature dict matching feature_columns in
     model_metadata.json.
 
-    Expected final keys (order handled in predictor.to_dataframe):
+    Expected final keys (put in FEATURE_COLUMNS order by the predictor):
 
         score,
         nyc_poverty_rate,
@@ -168,16 +324,12 @@ def build_feature_vector_from_raw(raw: dict) -> dict:
         zipcode = "00000"
 
     # 3. Cuisine → always string (lower or title won’t matter to model after encoding)
+    # Interned: a few hundred cuisines repeat across rows → one shared object each
     cuisine = raw.get("cuisine_description") or raw.get("cuisine") or "Other"
-    cuisine = str(cuisine).strip().lower() or "other"
+    cuisine = sys.intern(str(cuisine).strip().lower() or "other")
 
     # 4. Score → float
-    score = raw.get("score")
-    try:
-        score = float(score)
-    except Exception:
-        # Safe fallback (mid-range score)
-        score = 12.0
+    score = _to_score(raw.get("score"))
 
     # 5. Critical flag → int
     crit = (
@@ -186,10 +338,7 @@ def build_feature_vector_from_raw(raw: dict) -> dict:
         or raw.get("critical_flag_int")
         or 0
     )
-    try:
-        crit = int(crit)
-    except Exception:
-        crit = 0
+    crit = _to_flag(crit)
 
     # 6. Violation code → string
     vio = raw.get("violation_code") or "00X"
@@ -198,44 +347,20 @@ def build_feature_vector_from_raw(raw: dict) -> dict:
     # 7. Demographics via ZIP lookup (df_merged_big → ZIP table)
     demo = lookup_zip_demo(zipcode)
     if demo is not None:
-        nyc_poverty_rate = demo.get("nyc_poverty_rate", 0.20)
-        median_income = demo.get("median_income", 30000)
-        perc_white = demo.get("perc_white", 0.30)
-        perc_black = demo.get("perc_black", 0.30)
-        perc_asian = demo.get("perc_asian", 0.15)
-        perc_other = demo.get("perc_other", 0.05)
-        perc_hispanic = demo.get("perc_hispanic", 0.20)
-        indexscore = demo.get("indexscore", 4.0)
-        population = demo.get("population", 50000)
-
+        demo_values = {
+            col: demo.get(col, default) for col, default in _DEMO_DEFAULTS.items()
+        }
         pop_missing = 0
         demo_missing = 0
     else:
         # Fallback defaults if ZIP not found at all
-        nyc_poverty_rate = 0.20
-        median_income = 30000
-        perc_white = 0.30
-        perc_black = 0.30
-        perc_asian = 0.15
-        perc_other = 0.05
-        perc_hispanic = 0.20
-        indexscore = 4.0
-        population = 50000
-
+        demo_values = _DEMO_DEFAULTS
         pop_missing = 1
         demo_missing = 1
 
     features = {
         "score": score,
-        "nyc_poverty_rate": nyc_poverty_rate,
-        "median_income": median_income,
-        "perc_white": perc_white,
-        "perc_black": perc_black,
-        "perc_asian": perc_asian,
-        "perc_other": perc_other,
-        "perc_hispanic": perc_hispanic,
-        "indexscore": indexscore,
-        "population": population,
+        **demo_values,
         "pop_missing": pop_missing,
         "demo_missing": demo_missing,
         "critical_flag": crit,
@@ -248,8 +373,91 @@ def build_feature_vector_from_raw(raw: dict) -> dict:
     return features
 
 
+def build_feature_vectors_from_raw(raws) -> pd.DataFrame:
+    """
+    build_feature_vector_from_raw() for many restaurants at once.
+
+    Accepts a list of raw dicts or a DataFrame of raw rows and returns
+    ONE features DataFrame (same columns, same values as the per-row
+    function), row order preserved. Field cleanup runs column by column
+    and the demographics are joined for all ZIPs in a single reindex
+    instead of one dict lookup per restaurant.
+    """
+    if isinstance(raws, pd.DataFrame):
+        n = len(raws)
+
+        def col(name):
+            if name in raws.columns:
+                return raws[name].tolist()
+            return [None] * n
+    else:
+        n = len(raws)
+
+        def col(name):
+            return [raw.get(name) for raw in raws]
+
+    def first(*names, default):
+        return [
+            next((v for v in values if v), default)
+            for values in zip(*(col(name) for name in names))
+        ]
+
+    # 1-6. Base fields (same fallbacks as the per-row function)
+    boroughs = normalize_borough_series(
+        first("boro", "borough", default="Unknown")
+    ).tolist()
+
+    zipcodes = [str(z).strip() or "00000" for z in first("zipcode", default="00000")]
+
+    cuisines = [
+        sys.intern(str(c).strip().lower() or "other")
+        for c in first("cuisine_description", "cuisine", default="Other")
+    ]
+
+    scores = [_to_score(score) for score in col("score")]
+
+    crits = [
+        _to_flag(crit)
+        for crit in first(
+            "critical_flag", "critical_flag_bin", "critical_flag_int", default=0
+        )
+    ]
+
+    vios = [str(v).strip() or "00X" for v in first("violation_code", default="00X")]
+
+    # 7. Demographics: one join for every ZIP
+    demo = load_zip_demo_frame().reindex(zipcodes)
+    found = demo.index.isin(load_zip_demo_frame().index)
+    missing = np.where(found, 0, 1)
+
+    demo_values = {
+        name: (
+            demo[name].astype("float64").where(found, default).to_numpy()
+            if name in demo.columns
+            else [default] * n
+        )
+        for name, default in _DEMO_DEFAULTS.items()
+    }
+
+    features = pd.DataFrame(
+        {
+            "score": scores,
+            **demo_values,
+            "pop_missing": missing,
+            "demo_missing": missing,
+            "critical_flag": crits,
+            "boro": boroughs,
+            "zipcode": zipcodes,
+            "cuisine_description": cuisines,
+            "violation_code": vios,
+        }
+    )
+
+    return features
+
+
 # -------------------------------------------------
-# 7. Violation-code short labels (for charts / UI)
+# 8. Violation-code short labels (for charts / UI)
 # -------------------------------------------------
 
 VIOLATION_SHORT = {
@@ -275,6 +483,19 @@ VIOLATION_SHORT = {
 UNKNOWN_VIOLATION_LABEL = "Other"
 
 
+def label_violations(codes: pd.Series) -> pd.Series:
+    """
+    Short label for every violation code in a column (unknown → "Other").
+    One vectorized map instead of a Python-level .get per row; for a
+    categorical column only the distinct categories are looked up.
+    """
+    labels = codes.map(VIOLATION_SHORT)
+    if isinstance(labels.dtype, pd.CategoricalDtype):
+        # "Other" isn't one of the mapped categories → fill as plain strings
+        labels = labels.astype(object)
+    return labels.fillna(UNKNOWN_VIOLATION_LABEL)
+
+
 if __name__ == "__main__":
     # Quick sanity check
     raw_test = {